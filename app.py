@@ -1,12 +1,17 @@
-from models import User, Session
+from models import User, Session, SessionArchive, load_rosters, current_session_version, next_session_version
+# Aliased, the poll() view below would shadow the table
+from models import poll as poll_table, waitlist as waitlist_table
 from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash
 from config import Config
 from extensions import db  # Import db from extensions
 from flask_migrate import Migrate
-from sqlalchemy import asc
+from sqlalchemy import asc, func
 from datetime import datetime, timedelta
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_wtf.csrf import CSRFProtect
+from member_import import import_members
+from session_archive import archive_sessions
+import click
 
 
 app = Flask(__name__)
@@ -85,14 +90,102 @@ def logout():
 @app.route('/')
 @login_required
 def index():
-    # Get the current date
-    current_date = datetime.now().date()
+    # The session cards are rendered client side from the dashboard API
+    return render_template('index.html')
+
+
+# Fields the dashboard API can return, rosters are only loaded when asked for
+SESSION_API_FIELDS = ('date', 'slots', 'remaining_slots', 'waitlist_count', 'is_locked',
+                      'locks_at', 'status', 'version', 'participants', 'waitlist')
+SESSION_API_DEFAULT_FIELDS = SESSION_API_FIELDS[:-2]
+
+
+def count_by_session(association, session_ids):
+    return dict(db.session.query(association.c.session_id, func.count()).filter(
+        association.c.session_id.in_(session_ids)).group_by(association.c.session_id))
+
+
+def sessions_with_user(association, user_id, session_ids):
+    return {session_id for (session_id,) in db.session.query(association.c.session_id).filter(
+        association.c.user_id == user_id, association.c.session_id.in_(session_ids))}
+
 
-    # Retrieve only upcoming sessions sorted by the session date (oldest to newest)
+@app.route('/api/v1/sessions', methods=['GET'])
+@login_required
+def api_sessions():
+    fields = request.args.get('fields')
+    fields = [field.strip() for field in fields.split(',') if field.strip()] \
+        if fields else list(SESSION_API_DEFAULT_FIELDS)
+    unknown = set(fields) - set(SESSION_API_FIELDS) - {'id'}
+    if unknown:
+        return jsonify({'error': 'Unknown fields: ' + ', '.join(sorted(unknown))}), 400
+    # Only return sessions changed after this version, if given
+    since = request.args.get('since', type=int)
+
+    # Read the version first, so a concurrent change is at worst sent twice
+    version = current_session_version()
+    # A client ahead of the server (e.g. after a restore) gets a full reload
+    if since is not None and since > version:
+        since = None
+    current_date = datetime.now().date()
     sessions = Session.query.filter(
         Session.date >= current_date).order_by(asc(Session.date)).all()
+    # Locking depends on the clock, not on a change, so locked sessions are
+    # always sent (only the next day or so of sessions can be locked)
+    changed = [s for s in sessions if since is None or s.version > since or s.is_locked]
+    changed_ids = [s.id for s in changed]
+
+    # Load everything for the changed sessions in a handful of grouped queries
+    participant_counts = waitlist_counts = {}
+    joined = waitlisted = set()
+    participants = waitlisted_users = {}
+    if changed_ids:
+        if {'remaining_slots', 'waitlist_count'} & set(fields):
+            participant_counts = count_by_session(poll_table, changed_ids)
+            waitlist_counts = count_by_session(waitlist_table, changed_ids)
+        if 'status' in fields:
+            joined = sessions_with_user(poll_table, current_user.id, changed_ids)
+            waitlisted = sessions_with_user(waitlist_table, current_user.id, changed_ids)
+        if 'participants' in fields:
+            participants = load_rosters(poll_table, changed_ids)
+        if 'waitlist' in fields:
+            waitlisted_users = load_rosters(waitlist_table, changed_ids)
+
+    results = []
+    for s in changed:
+        if s.id in joined:
+            status = 'joined'
+        elif s.id in waitlisted:
+            status = 'waitlisted'
+        else:
+            status = None
+        values = {
+            'date': s.date.isoformat(),
+            'slots': s.slots,
+            'remaining_slots': s.slots - participant_counts.get(s.id, 0),
+            'waitlist_count': waitlist_counts.get(s.id, 0),
+            'is_locked': s.is_locked,
+            'locks_at': s.lock_time.isoformat(),
+            'status': status,
+            'version': s.version,
+        }
+        if 'participants' in fields:
+            values['participants'] = [{'display_name': display_name}
+                                      for _, display_name, _ in participants[s.id]]
+        if 'waitlist' in fields:
+            values['waitlist'] = [{'display_name': display_name}
+                                  for _, display_name, _ in waitlisted_users[s.id]]
+
+        result = {'id': s.id}
+        result.update((field, values[field]) for field in fields if field != 'id')
+        results.append(result)
 
-    return render_template('index.html', sessions=sessions)
+    return jsonify({
+        'version': version,
+        # Every upcoming session, so clients can drop the ones that went away
+        'ids': [s.id for s in sessions],
+        'sessions': results
+    })
 
 
 # Set a simple admin password (you can replace this with more secure logic)
@@ -133,6 +226,12 @@ def admin():
         Session.date >= current_date).order_by(asc(Session.date)).all()
     past_sessions = Session.query.filter(
         Session.date < current_date).order_by(Session.date.desc()).all()
+    # Older sessions live in the archive table, list a page of them after the live ones
+    archived_sessions = SessionArchive.query.filter(
+        SessionArchive.date < current_date).order_by(SessionArchive.date.desc()).paginate(
+        page=request.args.get('archive_page', 1, type=int),
+        per_page=app.config['ARCHIVE_PAGE_SIZE'], error_out=False)
+    past_sessions += archived_sessions.items
 
     if request.method == 'POST':
         # Add new session logic
@@ -152,7 +251,8 @@ def admin():
                 flash('Session added successfully!')
                 return redirect(url_for('admin'))
 
-    return render_template('admin.html', current_sessions=current_sessions, past_sessions=past_sessions)
+    return render_template('admin.html', current_sessions=current_sessions, past_sessions=past_sessions,
+                           archived_sessions=archived_sessions)
 
 
 @app.route('/admin/delete_session/<int:session_id>', methods=['POST'])
@@ -171,6 +271,22 @@ def delete_session(session_id):
     return redirect(url_for('admin'))
 
 
+@app.route('/admin/delete_archived_session/<int:archive_id>', methods=['POST'])
+def delete_archived_session(archive_id):
+    if not session.get('admin'):
+        return redirect(url_for('admin_login'))
+
+    archived = SessionArchive.query.get(archive_id)
+    if archived:
+        db.session.delete(archived)
+        db.session.commit()
+        flash('Session deleted successfully!')
+    else:
+        flash('Session not found.')
+
+    return redirect(url_for('admin'))
+
+
 @app.route('/admin/modify_session/<int:session_id>', methods=['POST'])
 def modify_session(session_id):
     if not session.get('admin'):
@@ -282,6 +398,134 @@ def remove_participant(session_id, user_id):
         return jsonify({'error': 'You are not part of this session.'}), 400
 
 
+def is_user_id(value):
+    # JSON true/false would pass isinstance(value, int)
+    return type(value) is int
+
+
+def apply_roster_operations(rosters, operations):
+    # Apply add/remove/move operations to copies of the roster id lists
+    rosters = {name: list(ids) for name, ids in rosters.items()}
+    if not isinstance(operations, list) or not all(isinstance(operation, dict) for operation in operations):
+        raise ValueError('Operations must be a list of objects.')
+    for operation in operations:
+        op = operation.get('op')
+        user_id = operation.get('user_id')
+        target = operation.get('list', 'participants')
+        position = operation.get('position')
+        if op not in ('add', 'remove', 'move') or not is_user_id(user_id) \
+                or not (position is None or type(position) is int):
+            raise ValueError(f'Invalid operation: {operation}')
+        if op != 'remove' and target not in rosters:
+            raise ValueError(f'Unknown list: {target}')
+
+        current = next((name for name, ids in rosters.items() if user_id in ids), None)
+        if op == 'add' and current:
+            raise ValueError(f'User {user_id} is already in the {current}.')
+        if op in ('remove', 'move') and not current:
+            raise ValueError(f'User {user_id} is not part of this session.')
+
+        if current:
+            rosters[current].remove(user_id)
+        if op != 'remove':
+            ids = rosters[target]
+            if position is None:
+                position = len(ids)
+            elif not 0 <= position <= len(ids):
+                raise ValueError(f'Position {position} is outside the {target}.')
+            ids.insert(position, user_id)
+    return rosters
+
+
+@app.route('/admin/session/<int:session_id>/roster', methods=['POST'])
+@login_required
+def update_roster(session_id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Only admins can edit rosters.'}), 403
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'error': 'Expected a JSON object.'}), 400
+    tables = {'participants': poll_table, 'waitlist': waitlist_table}
+
+    # Bump the version counter first: that takes the write lock, so nobody can
+    # join or leave between reading the roster and rewriting it below. The
+    # same version is stored on the session at the end
+    version = next_session_version()
+    session = Session.query.get_or_404(session_id)
+
+    def roster_error(message):
+        db.session.rollback()
+        return jsonify({'error': message}), 400
+
+    # Current rosters as ordered lists of user ids
+    current = {name: [user_id for user_id, _, _ in load_rosters(table, [session.id])[session.id]]
+               for name, table in tables.items()}
+
+    # Either a full desired ordering of both lists, or a list of operations
+    try:
+        if 'operations' in data:
+            desired = apply_roster_operations(current, data['operations'])
+        else:
+            desired = {name: data.get(name, current[name]) for name in tables}
+            if not all(isinstance(ids, list) and all(is_user_id(user_id) for user_id in ids)
+                       for ids in desired.values()):
+                raise ValueError('Rosters must be lists of user ids.')
+    except ValueError as error:
+        return roster_error(str(error))
+
+    all_ids = desired['participants'] + desired['waitlist']
+    if len(all_ids) != len(set(all_ids)):
+        return roster_error('A user can only appear once in the roster.')
+    if len(desired['participants']) > session.slots:
+        return roster_error(f'This session only has {session.slots} slots.')
+
+    names = dict(db.session.query(User.id, User.display_name).filter(User.id.in_(all_ids))) \
+        if all_ids else {}
+    missing = set(all_ids) - set(names)
+    if missing:
+        return roster_error('Unknown users: ' + ', '.join(map(str, sorted(missing))))
+
+    # Rows keep their insertion order, so keep the unchanged start of each list
+    # and rewrite everything after the first difference with bulk statements
+    changed = False
+    for name, table in tables.items():
+        keep = 0
+        while (keep < len(current[name]) and keep < len(desired[name])
+               and current[name][keep] == desired[name][keep]):
+            keep += 1
+        removed = current[name][keep:]
+        added = desired[name][keep:]
+        if removed:
+            db.session.execute(table.delete().where(
+                table.c.session_id == session.id, table.c.user_id.in_(removed)))
+        if added:
+            db.session.execute(table.insert(), [
+                {'user_id': user_id, 'session_id': session.id} for user_id in added])
+        changed = changed or bool(removed or added)
+
+    # Belt and braces for databases where the counter doesn't lock writers out
+    if count_by_session(poll_table, [session.id]).get(session.id, 0) > session.slots:
+        return roster_error(f'This session only has {session.slots} slots.')
+
+    if changed:
+        # A core update, as setting session.version would make the
+        # before_flush hook bump the counter a second time
+        db.session.execute(Session.__table__.update().where(
+            Session.id == session.id).values(version=version))
+    db.session.commit()
+
+    return jsonify({
+        'success': True,
+        'participants': [{'id': user_id, 'display_name': names[user_id]}
+                         for user_id in desired['participants']],
+        'waitlist': [{'id': user_id, 'display_name': names[user_id]}
+                     for user_id in desired['waitlist']],
+        'remaining_slots': session.slots - len(desired['participants']),
+        'waitlist_count': len(desired['waitlist'])
+    })
+
+
 @app.route('/admin/session/<int:session_id>/emails', methods=['GET'])
 @login_required
 def get_session_emails(session_id):
@@ -293,6 +537,37 @@ def get_session_emails(session_id):
     return jsonify({'emails': ', '.join(emails)})
 
 
+# View participants of an archived session in the admin panel
+@app.route('/admin/archive/<int:archive_id>/participants_json', methods=['GET'])
+@login_required
+def admin_archived_session_participants_json(archive_id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Only admins can view archived sessions.'}), 403
+
+    archived = SessionArchive.query.get_or_404(archive_id)
+    participants = [{'id': user['id'], 'display_name': user['display_name']}
+                    for user in archived.users]
+    waitlist = [{'id': user['id'], 'display_name': user['display_name']}
+                for user in archived.waitlist]
+
+    return jsonify({
+        'participants': participants,
+        'waitlist': waitlist
+    })
+
+
+@app.route('/admin/archive/<int:archive_id>/emails', methods=['GET'])
+@login_required
+def get_archived_session_emails(archive_id):
+    if not current_user.is_admin:
+        return jsonify({'error': 'Only admins can view archived sessions.'}), 403
+
+    archived = SessionArchive.query.get_or_404(archive_id)
+    emails = [user['email'] for user in archived.users]
+
+    return jsonify({'emails': ', '.join(emails)})
+
+
 @app.route('/poll', methods=['POST'])
 @login_required
 def poll():
@@ -436,6 +711,39 @@ def session_participants(session_id):
         return jsonify({'error': 'Session not found'}), 404
 
 
+@app.cli.command('import-members')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--workers', type=int, default=None,
+              help='Number of processes used to hash passwords.')
+def import_members_command(csv_path, workers):
+    """Bulk register members from a CSV of email, display_name, password."""
+    report = import_members(csv_path, workers=workers)
+
+    for email in report['created']:
+        if email in report['invites']:
+            click.echo(f'created  {email} (invite token: {report["invites"][email]})')
+        else:
+            click.echo(f'created  {email}')
+    for line, email, reason in report['skipped']:
+        click.echo(f'skipped  line {line}: {email or "<blank>"} ({reason})')
+
+    click.echo(
+        f'{len(report["created"])} created, {len(report["skipped"])} skipped.')
+
+
+@app.cli.command('archive-sessions')
+@click.option('--days', type=int, default=None,
+              help='Archive sessions older than this many days.')
+def archive_sessions_command(days):
+    """Move old sessions and their rosters into the archive table."""
+    if days is None:
+        days = app.config['SESSION_ARCHIVE_AFTER_DAYS']
+    before = datetime.now().date() - timedelta(days=days)
+
+    archived = archive_sessions(before)
+    click.echo(f'{archived} sessions older than {before} archived.')
+
+
 if __name__ == "__main__":
     # Allow access from any IP address
     app.run(debug=True, host='0.0.0.0', port=8000)
@@ -0,0 +1,134 @@
+"""Measure how the main routes scale with the size of the database.
+
+Run from the repository root:
+
+    python -m benchmarks.bench_routes --sizes tiny small medium --json bench.json
+
+Each size is built and measured in its own process, because the app binds
+its database from DATABASE_URL when it is imported.
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.fixtures import SIZES
+
+
+def _routes(session_id):
+    return [
+        ('index', '/'),
+        ('admin', '/admin'),
+        ('api_sessions', '/api/v1/sessions?fields=date,slots,remaining_slots,'
+                         'waitlist_count,is_locked,status,participants,waitlist'),
+        ('session_participants', f'/session_participants/{session_id}'),
+        ('admin_participants_json',
+         f'/admin/session/{session_id}/participants_json'),
+    ]
+
+
+def run_worker(size, repeat):
+    # Imported here so DATABASE_URL is already set by the parent process
+    from sqlalchemy import event, func
+    from app import app
+    from extensions import db
+    from models import Session, poll
+    from benchmarks.fixtures import build_database
+
+    results = {'size': size}
+    with app.app_context():
+        start = time.perf_counter()
+        results['fixture'] = build_database(**SIZES[size])
+        results['fixture']['build_seconds'] = round(
+            time.perf_counter() - start, 2)
+
+        # Benchmark the participants endpoints on the largest upcoming roster
+        session_id = db.session.query(poll.c.session_id).join(
+            Session, Session.id == poll.c.session_id).filter(
+            Session.date >= datetime.now().date()).group_by(
+            poll.c.session_id).order_by(func.count().desc()).limit(1).scalar()
+
+        statements = []
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda *args: statements.append(1))
+
+    client = app.test_client()
+    with client.session_transaction() as flask_session:
+        flask_session['_user_id'] = '1'  # The generated admin user
+
+    results['routes'] = {}
+    for name, url in _routes(session_id):
+        timings = []
+        for _ in range(repeat):
+            del statements[:]
+            start = time.perf_counter()
+            response = client.get(url)
+            timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(f'{url} returned {response.status_code}')
+
+        timings.sort()
+        results['routes'][name] = {
+            'median_ms': round(statistics.median(timings), 2),
+            'p95_ms': round(timings[math.ceil(0.95 * len(timings)) - 1], 2),
+            'statements': len(statements),
+        }
+
+    return results
+
+
+def run_size(size, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'bench.db')
+        output = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_routes',
+             '--worker', size, '--repeat', str(repeat)],
+            env=env, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def print_table(results):
+    header = f'{"size":<8}{"users":>8}{"sessions":>10}  {"route":<26}' \
+             f'{"median ms":>10}{"p95 ms":>10}{"queries":>9}'
+    print(header)
+    print('-' * len(header))
+    for result in results:
+        fixture = result['fixture']
+        for name, route in result['routes'].items():
+            print(f'{result["size"]:<8}{fixture["users"]:>8}'
+                  f'{fixture["sessions"]:>10}  {name:<26}'
+                  f'{route["median_ms"]:>10}{route["p95_ms"]:>10}'
+                  f'{route["statements"]:>9}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', nargs='+', choices=SIZES,
+                        default=list(SIZES))
+    parser.add_argument('--repeat', type=int, default=20,
+                        help='Requests per route and size.')
+    parser.add_argument('--json', dest='json_path',
+                        help='Also write the results to this file.')
+    parser.add_argument('--worker', choices=SIZES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.repeat)))
+        return
+
+    results = [run_size(size, args.repeat) for size in args.sizes]
+    print_table(results)
+    if args.json_path:
+        with open(args.json_path, 'w') as json_file:
+            json.dump(results, json_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+import os
+import random
+from datetime import datetime, timedelta
+
+from flask import current_app
+from flask_bcrypt import generate_password_hash
+from sqlalchemy.engine import make_url
+
+from config import DEFAULT_DATABASE_URI
+from extensions import db
+from models import User, Session, poll, waitlist
+
+# Named database sizes used by the scaling benchmark
+SIZES = {
+    'tiny': {'users': 100, 'sessions': 10},
+    'small': {'users': 1000, 'sessions': 100},
+    'medium': {'users': 10000, 'sessions': 1000},
+    'large': {'users': 50000, 'sessions': 10000},
+}
+
+# Password shared by every generated user
+FIXTURE_PASSWORD = 'password'
+
+INSERT_BATCH_SIZE = 5000
+
+
+def _insert(table, rows):
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        db.session.execute(table.insert(), rows[start:start + INSERT_BATCH_SIZE])
+
+
+def build_database(users, sessions, seed=0, upcoming=None):
+    """Fill the (empty) database with synthetic users, sessions and rosters.
+
+    Sessions are one day apart and end `upcoming` days from today, so most
+    of a large database is in the past, like a club that has run for years.
+    """
+    # This drops every table, never let it near the real database. Look at
+    # what the engine is bound to, however the URL was spelled or configured
+    url = db.engine.url
+    default = make_url(DEFAULT_DATABASE_URI)
+    if url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:'):
+        real_database = os.path.join(current_app.instance_path, default.database)
+        if os.path.realpath(url.database) == os.path.realpath(real_database):
+            raise RuntimeError(
+                'Set DATABASE_URL to a throwaway database before building fixtures.')
+
+    rng = random.Random(seed)
+    if upcoming is None:
+        upcoming = max(5, sessions // 20)
+
+    db.drop_all()
+    db.create_all()
+
+    # Hashing is slow, so every user shares one precomputed hash
+    password_hash = generate_password_hash(FIXTURE_PASSWORD).decode('utf-8')
+    _insert(User.__table__, [
+        {'id': user_id, 'email': f'member{user_id}@example.com',
+         'display_name': f'Member {user_id}', 'password_hash': password_hash,
+         'is_admin': user_id == 1}
+        for user_id in range(1, users + 1)
+    ])
+
+    first_date = datetime.now().date() + timedelta(days=upcoming - sessions)
+    session_rows = []
+    poll_rows = []
+    waitlist_rows = []
+    for session_id in range(1, sessions + 1):
+        slots = rng.randint(8, 24)
+        session_rows.append({
+            'id': session_id,
+            'date': first_date + timedelta(days=session_id - 1),
+            'slots': slots,
+        })
+
+        # Most sessions fill up, popular ones also build a waitlist
+        roster_size = min(users, rng.randint(slots // 2, slots + 12))
+        roster = rng.sample(range(1, users + 1), roster_size)
+        poll_rows += [{'user_id': user_id, 'session_id': session_id}
+                      for user_id in roster[:slots]]
+        waitlist_rows += [{'user_id': user_id, 'session_id': session_id}
+                          for user_id in roster[slots:]]
+
+    _insert(Session.__table__, session_rows)
+    _insert(poll, poll_rows)
+    _insert(waitlist, waitlist_rows)
+    db.session.commit()
+
+    return {'users': users, 'sessions': sessions, 'upcoming': upcoming,
+            'participants': len(poll_rows), 'waitlisted': len(waitlist_rows)}
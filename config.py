@@ -1,9 +1,15 @@
 import os
 
 basedir = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_DATABASE_URI = 'sqlite:///database.db'
 
 
 class Config:
     SECRET_KEY = 'supersecretkey'  # Use a secure random key for production
-    SQLALCHEMY_DATABASE_URI = 'sqlite:///database.db'
+    SQLALCHEMY_DATABASE_URI = os.environ.get(
+        'DATABASE_URL', DEFAULT_DATABASE_URI)
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Sessions older than this many days are moved to the archive tables
+    SESSION_ARCHIVE_AFTER_DAYS = 90
+    # Archived sessions shown per page in the admin panel
+    ARCHIVE_PAGE_SIZE = 20
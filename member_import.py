@@ -0,0 +1,119 @@
+import csv
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+
+from flask_bcrypt import generate_password_hash
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import User
+
+# Number of users inserted per transaction
+IMPORT_BATCH_SIZE = 200
+
+
+def hash_password(password):
+    # Runs inside a worker process, so it must stay a module level function
+    return generate_password_hash(password).decode('utf-8')
+
+
+def read_members_csv(path):
+    # Expected columns: email, display_name and an optional password.
+    # Rows come back with the file line they end on, quoted fields can span
+    # several lines and blank lines are skipped, so rows aren't lines
+    rows = []
+    with open(path, newline='', encoding='utf-8-sig') as csv_file:
+        reader = csv.DictReader(csv_file)
+        for row in reader:
+            rows.append((reader.line_num, {
+                key.strip().lower(): (value or '').strip()
+                for key, value in row.items() if key}))
+    return rows
+
+
+def validate_members(rows):
+    valid = []
+    skipped = []
+    seen = set()
+
+    for line, row in rows:
+        email = row.get('email', '')
+        display_name = row.get('display_name', '')
+
+        if not email or '@' not in email or len(email) > 120:
+            skipped.append((line, email, 'invalid email'))
+        elif not display_name or len(display_name) > 50 \
+                or '\n' in display_name or '\r' in display_name:
+            skipped.append((line, email, 'invalid display name'))
+        elif email in seen:
+            skipped.append((line, email, 'duplicate in file'))
+        else:
+            seen.add(email)
+            valid.append((line, row))
+
+    # Check every remaining email against the database in a single query
+    emails = [row['email'] for _, row in valid]
+    existing = {
+        email for (email,) in
+        db.session.query(User.email).filter(User.email.in_(emails))
+    } if emails else set()
+
+    members = []
+    for line, row in valid:
+        if row['email'] in existing:
+            skipped.append((line, row['email'], 'email is already registered'))
+        else:
+            members.append((line, row))
+
+    skipped.sort()
+    return members, skipped
+
+
+def import_members(path, workers=None):
+    members, skipped = validate_members(read_members_csv(path))
+
+    # Rows without a password get a generated invite token as their password
+    invites = {}
+    passwords = []
+    for _, row in members:
+        password = row.get('password')
+        if not password:
+            password = secrets.token_urlsafe(12)
+            invites[row['email']] = password
+        passwords.append(password)
+
+    # bcrypt is CPU bound, so spread the hashing across processes
+    hashes = []
+    if passwords:
+        workers = workers or os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunksize = max(1, len(passwords) // (workers * 4))
+            hashes = list(executor.map(
+                hash_password, passwords, chunksize=chunksize))
+
+    lines = [line for line, _ in members]
+    mappings = [
+        {'email': row['email'], 'display_name': row['display_name'],
+         'password_hash': password_hash, 'is_admin': False}
+        for (_, row), password_hash in zip(members, hashes)
+    ]
+
+    created = []
+    for start in range(0, len(mappings), IMPORT_BATCH_SIZE):
+        batch = mappings[start:start + IMPORT_BATCH_SIZE]
+        try:
+            db.session.bulk_insert_mappings(User, batch)
+            db.session.commit()
+        except IntegrityError:
+            # Most likely someone registered one of these emails meanwhile,
+            # earlier batches stay committed and the import carries on
+            db.session.rollback()
+            skipped.extend(
+                (line, mapping['email'], 'batch rolled back, duplicate email')
+                for line, mapping in zip(lines[start:], batch))
+            continue
+        created.extend(mapping['email'] for mapping in batch)
+
+    skipped.sort()
+    return {'created': created, 'skipped': skipped, 'invites': invites}
@@ -1,7 +1,9 @@
 from extensions import db
+from sqlalchemy import DDL, event, inspect, literal_column
 from flask_login import UserMixin
 from flask_bcrypt import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
+import json
 
 # Define the association table for waitlist
 waitlist = db.Table('waitlist',
@@ -47,9 +49,14 @@ class User(UserMixin, db.Model):
 
 
 class Session(db.Model):
+    is_archived = False
+
     id = db.Column(db.Integer, primary_key=True)
     date = db.Column(db.Date, nullable=False)
     slots = db.Column(db.Integer, nullable=False)
+    # Bumped from a global counter whenever the session or its rosters change
+    version = db.Column(db.Integer, nullable=False, default=0,
+                        server_default='0', index=True)
 
     # Relationship with users
     users = db.relationship('User', secondary='poll',
@@ -58,13 +65,112 @@ class Session(db.Model):
         'User', secondary='waitlist', back_populates='waitlisted_sessions')
 
     @property
-    def is_locked(self):
-        lock_time = datetime.combine(
+    def lock_time(self):
+        return datetime.combine(
             # datetime for 8pm night before session
             self.date - timedelta(days=1), datetime.min.time()) + timedelta(hours=20)
             # date for testing
             # self.date - timedelta(days=1), datetime.min.time()) + timedelta(hours=15) + timedelta(minutes=36)
-        return datetime.now() >= lock_time
+
+    @property
+    def is_locked(self):
+        return datetime.now() >= self.lock_time
+
+
+class SessionVersion(db.Model):
+    # Single row counter behind Session.version. It only ever goes up, so
+    # deleting the newest session can't hand its version out a second time
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Tables made with create_all() (rather than the migrations) need the row too
+event.listen(SessionVersion.__table__, 'after_create',
+             DDL('INSERT INTO session_version (id, value) VALUES (1, 0)'))
+
+
+@event.listens_for(db.session, 'before_flush')
+def bump_session_versions(session, flush_context, instances):
+    # Give every new or changed session (including roster changes) the next
+    # global version, so clients can ask for everything changed since N
+    changed = {obj for obj in session.new if isinstance(obj, Session)}
+    changed.update(obj for obj in session.dirty
+                   if isinstance(obj, Session) and session.is_modified(obj))
+    # Rosters can also be changed from the user side (user.sessions.append),
+    # which leaves the session objects themselves untouched
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            for name in ('sessions', 'waitlisted_sessions'):
+                history = inspect(obj).attrs[name].history
+                changed.update(history.added)
+                changed.update(history.deleted)
+    changed -= set(session.deleted)
+    if not changed:
+        return
+
+    with session.no_autoflush:
+        version = next_session_version()
+    for obj in changed:
+        obj.version = version
+
+
+def current_session_version():
+    return db.session.query(SessionVersion.value).scalar() or 0
+
+
+def next_session_version():
+    # Bumped in the caller's transaction, which also serialises writers on it
+    db.session.execute(SessionVersion.__table__.update().values(
+        value=SessionVersion.__table__.c.value + 1))
+    return current_session_version()
+
+
+def load_rosters(association, session_ids):
+    # Fetch the rosters of many sessions in one query, keyed by session id.
+    # Rosters are in the order users joined, which is the association rowid
+    rows = db.session.query(
+        association.c.session_id, User.id, User.display_name, User.email
+    ).join(User, User.id == association.c.user_id).filter(
+        association.c.session_id.in_(session_ids)).order_by(
+        association.c.session_id, literal_column(f'{association.name}.rowid'))
+
+    rosters = {session_id: [] for session_id in session_ids}
+    for session_id, user_id, display_name, email in rows:
+        rosters[session_id].append((user_id, display_name, email))
+    return rosters
+
+
+class SessionArchive(db.Model):
+    is_archived = True
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Id the session had in the live table before it was archived. Not unique,
+    # SQLite hands the id out again once the newest session is archived
+    session_id = db.Column(db.Integer, nullable=False, index=True)
+    date = db.Column(db.Date, nullable=False, index=True)
+    slots = db.Column(db.Integer, nullable=False)
+    # Final rosters packed as JSON lists of [user_id, display_name, email]
+    participants = db.Column(db.Text, nullable=False, default='[]')
+    waitlisted = db.Column(db.Text, nullable=False, default='[]')
+    archived_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+
+    @staticmethod
+    def pack_roster(users):
+        return json.dumps([[user_id, display_name, email]
+                           for user_id, display_name, email in users])
+
+    @staticmethod
+    def unpack_roster(packed):
+        return [{'id': user_id, 'display_name': display_name, 'email': email}
+                for user_id, display_name, email in json.loads(packed)]
+
+    @property
+    def users(self):
+        return self.unpack_roster(self.participants)
+
+    @property
+    def waitlist(self):
+        return self.unpack_roster(self.waitlisted)
 
 
 class Fee(db.Model):
@@ -0,0 +1,39 @@
+from extensions import db
+from models import Session, SessionArchive, poll, waitlist, load_rosters
+
+# Number of sessions moved to the archive per transaction
+ARCHIVE_BATCH_SIZE = 500
+
+
+def archive_sessions(before):
+    """Move sessions dated before `before` into the archive table."""
+    archived = 0
+
+    while True:
+        sessions = db.session.query(Session.id, Session.date, Session.slots).filter(
+            Session.date < before).order_by(Session.date).limit(ARCHIVE_BATCH_SIZE).all()
+        if not sessions:
+            break
+
+        session_ids = [session_id for session_id, _, _ in sessions]
+        participants = load_rosters(poll, session_ids)
+        waitlisted = load_rosters(waitlist, session_ids)
+
+        db.session.bulk_insert_mappings(SessionArchive, [
+            {'session_id': session_id, 'date': date, 'slots': slots,
+             'participants': SessionArchive.pack_roster(participants[session_id]),
+             'waitlisted': SessionArchive.pack_roster(waitlisted[session_id])}
+            for session_id, date, slots in sessions
+        ])
+
+        db.session.execute(poll.delete().where(
+            poll.c.session_id.in_(session_ids)))
+        db.session.execute(waitlist.delete().where(
+            waitlist.c.session_id.in_(session_ids)))
+        Session.query.filter(Session.id.in_(session_ids)).delete(
+            synchronize_session=False)
+        db.session.commit()
+
+        archived += len(sessions)
+
+    return archived